@@ -1,48 +1,62 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from typing import List, Optional
-from datetime import datetime
+from fastapi import APIRouter, Depends, Query, status
+from fastapi.responses import StreamingResponse
+from typing import Iterator, List, Optional
+from datetime import datetime, timezone
 
 from app.models.attempt import Attempt, AttemptCreate, AttemptUpdate
-from app.services.firebase_service import get_firebase_app
-from app.repositories.attempts import AttemptRepository
+from app.repositories.attempts import AttemptRepository, get_attempt_repository
 
 router = APIRouter()
 
+def _json_array(attempts: Iterator[Attempt]) -> Iterator[bytes]:
+    """
+    Encode attempts as a JSON array, one chunk per attempt.
+    Starlette runs this blocking generator in the threadpool, so bytes go out
+    while later documents are still being fetched from Firestore.
+    """
+    yield b"["
+    for index, attempt in enumerate(attempts):
+        if index:
+            yield b","
+        yield attempt.model_dump_json().encode()
+    yield b"]"
+
 @router.get("/user/{user_id}", response_model=List[Attempt])
 async def get_user_attempts(
     user_id: str,
     limit: int = Query(100, ge=1, le=100),
-    firebase_app=Depends(get_firebase_app)
+    start_after: Optional[str] = None,
+    repo: AttemptRepository = Depends(get_attempt_repository)
 ):
     """
     Get all attempts for a specific user.
+    Pass the ID of the last attempt received as start_after to get the next page.
     """
-    repo = AttemptRepository()
-    attempts = await repo.get_all_by_user(user_id, limit)
-    return attempts
+    attempts = await repo.stream_by_user(user_id, limit, start_after)
+    return StreamingResponse(_json_array(attempts), media_type="application/json")
 
 @router.get("/quiz/{quiz_id}", response_model=List[Attempt])
 async def get_quiz_attempts(
     quiz_id: str,
     limit: int = Query(100, ge=1, le=100),
-    firebase_app=Depends(get_firebase_app)
+    start_after: Optional[str] = None,
+    repo: AttemptRepository = Depends(get_attempt_repository)
 ):
     """
     Get all attempts for a specific quiz.
+    Pass the ID of the last attempt received as start_after to get the next page.
     """
-    repo = AttemptRepository()
-    attempts = await repo.get_all_by_quiz(quiz_id, limit)
-    return attempts
+    attempts = await repo.stream_by_quiz(quiz_id, limit, start_after)
+    return StreamingResponse(_json_array(attempts), media_type="application/json")
 
 @router.get("/{attempt_id}", response_model=Attempt)
 async def get_attempt(
     attempt_id: str,
-    firebase_app=Depends(get_firebase_app)
+    repo: AttemptRepository = Depends(get_attempt_repository)
 ):
     """
     Get a specific attempt by ID.
     """
-    repo = AttemptRepository()
     return await repo.get_by_id(attempt_id)
 
 @router.post("/", response_model=Attempt, status_code=status.HTTP_201_CREATED)
@@ -50,12 +64,11 @@ async def create_attempt(
     attempt: AttemptCreate,
     # We will implement proper authentication later
     user_id: str,
-    firebase_app=Depends(get_firebase_app)
+    repo: AttemptRepository = Depends(get_attempt_repository)
 ):
     """
     Create a new attempt (start a quiz).
     """
-    repo = AttemptRepository()
     return await repo.create(attempt, user_id)
 
 @router.put("/{attempt_id}", response_model=Attempt)
@@ -64,18 +77,14 @@ async def update_attempt(
     attempt: AttemptUpdate,
     # We will implement proper authentication later
     user_id: str,
-    firebase_app=Depends(get_firebase_app)
+    repo: AttemptRepository = Depends(get_attempt_repository)
 ):
     """
     Update an attempt (add answers, mark questions for review, complete quiz).
     """
-    repo = AttemptRepository()
-    
     # If completing the attempt, add completion timestamp
-    if attempt.completed_at is None and any(key in attempt.model_dump(exclude_unset=True) for key in ["answers"]):
-        completed_data = attempt.model_copy()
-        completed_data.completed_at = datetime.now()
-        return await repo.update(attempt_id, completed_data, user_id)
+    if attempt.completed_at is None and attempt.answers is not None:
+        attempt.completed_at = datetime.now(timezone.utc)
     
     return await repo.update(attempt_id, attempt, user_id)
 
@@ -84,11 +93,10 @@ async def delete_attempt(
     attempt_id: str,
     # We will implement proper authentication later
     user_id: str,
-    firebase_app=Depends(get_firebase_app)
+    repo: AttemptRepository = Depends(get_attempt_repository)
 ):
     """
     Delete an attempt.
     """
-    repo = AttemptRepository()
     await repo.delete(attempt_id, user_id)
     return {"message": "Attempt deleted successfully"} 
\ No newline at end of file
@@ -1,12 +1,16 @@
 from fastapi import APIRouter
+from fastapi.responses import ORJSONResponse
 from app.core.firebase_config import FIREBASE_WEB_CONFIG
 
 router = APIRouter()
 
-@router.get("/firebase")
+# The config never changes at runtime, so serialize it once at import time
+_FIREBASE_CONFIG_RESPONSE = ORJSONResponse(FIREBASE_WEB_CONFIG)
+
+@router.get("/firebase", response_class=ORJSONResponse)
 async def get_firebase_config():
     """
     Return Firebase configuration for the frontend.
     This endpoint can be called by the frontend to get the Firebase configuration.
     """
-    return FIREBASE_WEB_CONFIG 
\ No newline at end of file
+    return _FIREBASE_CONFIG_RESPONSE
\ No newline at end of file
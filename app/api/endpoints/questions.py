@@ -1,74 +1,95 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from typing import List, Optional, Union
 
-from app.models.question import Question, QuestionCreate, Category, Difficulty
-from app.services.firebase_service import get_firebase_app
-from app.repositories.questions import QuestionRepository
+from app.models.question import Question, QuestionCreate, QuestionSummary, Category, Difficulty
+from app.repositories.questions import MAX_BATCH_WRITES, QUESTION_LIST_ADAPTER, QUESTION_SUMMARY_LIST_ADAPTER, QuestionRepository, get_question_repository
+from app.repositories.pagination import NEXT_CURSOR_HEADER
 
 router = APIRouter()
 
-@router.get("/", response_model=List[Question])
+@router.get("/", response_model=Union[List[Question], List[QuestionSummary]])
 async def get_questions(
     limit: int = Query(100, ge=1, le=100),
     category: Optional[Category] = None,
     difficulty: Optional[Difficulty] = None,
     tags: Optional[List[str]] = Query(None),
-    firebase_app=Depends(get_firebase_app)
+    match_all: bool = False,
+    cursor: Optional[str] = None,
+    view: str = Query("full", pattern="^(full|summary)$"),
+    repo: QuestionRepository = Depends(get_question_repository)
 ):
     """
     Get list of questions with optional filtering.
+    Items matching any of the given tags are returned, or only those with all of them if match_all is set.
+    If there are more results, the X-Next-Cursor header holds the cursor for the next page.
+    With view=summary only the list-view fields are fetched and returned.
     """
-    repo = QuestionRepository()
-    questions = await repo.get_all(
+    summary = view == "summary"
+    questions, next_cursor = await repo.get_all(
         limit=limit,
         category=category,
         difficulty=difficulty,
-        tags=tags
+        tags=tags,
+        match_all=match_all,
+        cursor=cursor,
+        summary=summary
     )
-    return questions
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    adapter = QUESTION_SUMMARY_LIST_ADAPTER if summary else QUESTION_LIST_ADAPTER
+    return Response(adapter.dump_json(questions), media_type="application/json", headers=headers)
 
 @router.get("/{question_id}", response_model=Question)
 async def get_question(
     question_id: str, 
-    firebase_app=Depends(get_firebase_app)
+    repo: QuestionRepository = Depends(get_question_repository)
 ):
     """
     Get a specific question by ID.
     """
-    repo = QuestionRepository()
     return await repo.get_by_id(question_id)
 
 @router.post("/", response_model=Question, status_code=201)
 async def create_question(
     question: QuestionCreate,
-    firebase_app=Depends(get_firebase_app)
+    repo: QuestionRepository = Depends(get_question_repository)
 ):
     """
     Create a new question.
     """
-    repo = QuestionRepository()
     return await repo.create(question)
 
+@router.post("/batch", response_model=List[Question], status_code=201)
+async def create_questions(
+    questions: List[QuestionCreate],
+    repo: QuestionRepository = Depends(get_question_repository)
+):
+    """
+    Create several questions at once.
+    At most MAX_BATCH_WRITES questions can be sent, so they are written in one atomic batch.
+    """
+    if len(questions) > MAX_BATCH_WRITES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_WRITES} questions can be created at once")
+    created = await repo.create_many(questions)
+    return Response(QUESTION_LIST_ADAPTER.dump_json(created), media_type="application/json", status_code=201)
+
 @router.put("/{question_id}", response_model=Question)
 async def update_question(
     question_id: str,
     question: QuestionCreate,
-    firebase_app=Depends(get_firebase_app)
+    repo: QuestionRepository = Depends(get_question_repository)
 ):
     """
     Update an existing question.
     """
-    repo = QuestionRepository()
-    return await repo.update(question_id, question.model_dump())
+    return await repo.update(question_id, question.model_dump(mode="json"))
 
 @router.delete("/{question_id}")
 async def delete_question(
     question_id: str,
-    firebase_app=Depends(get_firebase_app)
+    repo: QuestionRepository = Depends(get_question_repository)
 ):
     """
     Delete a question (soft delete).
     """
-    repo = QuestionRepository()
     await repo.delete(question_id)
     return {"message": "Question deleted successfully"} 
\ No newline at end of file
@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, Query, status, Response
 from typing import List, Optional
 
+from app.models.question import Question
 from app.models.quiz import Quiz, QuizCreate, QuizUpdate, Category, Difficulty
-from app.services.firebase_service import get_firebase_app
-from app.repositories.quizzes import QuizRepository
+from app.repositories.questions import QUESTION_LIST_ADAPTER, QuestionRepository, get_question_repository
+from app.repositories.quizzes import QUIZ_LIST_ADAPTER, QuizRepository, get_quiz_repository
+from app.repositories.pagination import NEXT_CURSOR_HEADER
 
 router = APIRouter()
 
@@ -14,61 +16,78 @@ async def get_quizzes(
     difficulty: Optional[Difficulty] = None,
     tags: Optional[List[str]] = Query(None),
     only_public: bool = True,
-    firebase_app=Depends(get_firebase_app)
+    match_all: bool = False,
+    cursor: Optional[str] = None,
+    repo: QuizRepository = Depends(get_quiz_repository)
 ):
     """
     Get list of quizzes with optional filtering.
+    Items matching any of the given tags are returned, or only those with all of them if match_all is set.
+    If there are more results, the X-Next-Cursor header holds the cursor for the next page.
     """
-    repo = QuizRepository()
-    quizzes = await repo.get_all(
+    quizzes, next_cursor = await repo.get_all(
         limit=limit,
         category=category,
         difficulty=difficulty,
         tags=tags,
-        only_public=only_public
+        only_public=only_public,
+        match_all=match_all,
+        cursor=cursor
     )
-    return quizzes
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return Response(QUIZ_LIST_ADAPTER.dump_json(quizzes), media_type="application/json", headers=headers)
 
 @router.get("/user/{user_id}", response_model=List[Quiz])
 async def get_user_quizzes(
     user_id: str,
     limit: int = Query(100, ge=1, le=100),
     include_private: bool = True,
-    firebase_app=Depends(get_firebase_app)
+    repo: QuizRepository = Depends(get_quiz_repository)
 ):
     """
     Get quizzes created by a specific user.
     """
-    repo = QuizRepository()
     quizzes = await repo.get_by_user(
         user_id=user_id,
         limit=limit,
         include_private=include_private
     )
-    return quizzes
+    return Response(QUIZ_LIST_ADAPTER.dump_json(quizzes), media_type="application/json")
 
 @router.get("/{quiz_id}", response_model=Quiz)
 async def get_quiz(
     quiz_id: str,
-    firebase_app=Depends(get_firebase_app)
+    repo: QuizRepository = Depends(get_quiz_repository)
 ):
     """
     Get a specific quiz by ID.
     """
-    repo = QuizRepository()
     return await repo.get_by_id(quiz_id)
 
+@router.get("/{quiz_id}/questions", response_model=List[Question])
+async def get_quiz_questions(
+    quiz_id: str,
+    repo: QuizRepository = Depends(get_quiz_repository),
+    question_repo: QuestionRepository = Depends(get_question_repository)
+):
+    """
+    Get the questions of a quiz, in quiz order.
+    """
+    quiz = await repo.get_by_id(quiz_id)
+    question_ids = [ref.question_id for ref in sorted(quiz.questions, key=lambda ref: ref.order)]
+    questions = await question_repo.get_many(question_ids)
+    return Response(QUESTION_LIST_ADAPTER.dump_json(questions), media_type="application/json")
+
 @router.post("/", response_model=Quiz, status_code=status.HTTP_201_CREATED)
 async def create_quiz(
     quiz: QuizCreate,
     # We will implement proper authentication later
     user_id: str,
-    firebase_app=Depends(get_firebase_app)
+    repo: QuizRepository = Depends(get_quiz_repository)
 ):
     """
     Create a new quiz.
     """
-    repo = QuizRepository()
     return await repo.create(quiz, user_id)
 
 @router.put("/{quiz_id}", response_model=Quiz)
@@ -77,12 +96,11 @@ async def update_quiz(
     quiz: QuizUpdate,
     # We will implement proper authentication later
     user_id: str,
-    firebase_app=Depends(get_firebase_app)
+    repo: QuizRepository = Depends(get_quiz_repository)
 ):
     """
     Update an existing quiz.
     """
-    repo = QuizRepository()
     return await repo.update(quiz_id, quiz, user_id)
 
 @router.delete("/{quiz_id}")
@@ -90,11 +108,10 @@ async def delete_quiz(
     quiz_id: str,
     # We will implement proper authentication later
     user_id: str,
-    firebase_app=Depends(get_firebase_app)
+    repo: QuizRepository = Depends(get_quiz_repository)
 ):
     """
     Delete a quiz (soft delete).
     """
-    repo = QuizRepository()
     await repo.delete(quiz_id, user_id)
     return {"message": "Quiz deleted successfully"} 
\ No newline at end of file
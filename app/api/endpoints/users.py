@@ -1,64 +1,85 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, Query, status, Response
+from typing import List, Optional
 
-from app.models.user import User, UserCreate, UserUpdate
-from app.services.firebase_service import get_firebase_app
-from app.repositories.users import UserRepository
+from app.models.user import User, UserCreate, UserUpdate, UserStatsAggregate
+from app.repositories.users import USER_LIST_ADAPTER, USER_STATS_LIST_ADAPTER, UserRepository, get_user_repository
+from app.repositories.pagination import NEXT_CURSOR_HEADER
 
 router = APIRouter()
 
 @router.get("/", response_model=List[User])
 async def get_users(
-    firebase_app=Depends(get_firebase_app)
+    limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = None,
+    repo: UserRepository = Depends(get_user_repository)
 ):
     """
     Get all users. Requires admin privileges.
+    If there are more results, the X-Next-Cursor header holds the cursor for the next page.
     """
-    repo = UserRepository()
-    return await repo.get_all()
+    users, next_cursor = await repo.get_all(limit=limit, cursor=cursor)
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return Response(USER_LIST_ADAPTER.dump_json(users), media_type="application/json", headers=headers)
+
+@router.get("/leaderboard", response_model=List[UserStatsAggregate])
+async def get_leaderboard(
+    limit: int = Query(10, ge=1, le=100),
+    repo: UserRepository = Depends(get_user_repository)
+):
+    """
+    Get the users with the most correct answers.
+    """
+    entries = await repo.get_leaderboard(limit=limit)
+    return Response(USER_STATS_LIST_ADAPTER.dump_json(entries), media_type="application/json")
 
 @router.get("/me", response_model=User)
 async def get_current_user(
     # We will implement proper authentication later
     user_id: str,
-    firebase_app=Depends(get_firebase_app)
+    repo: UserRepository = Depends(get_user_repository)
 ):
     """
     Get the current authenticated user.
     """
-    repo = UserRepository()
     return await repo.get_by_id(user_id)
 
 @router.get("/{user_id}", response_model=User)
 async def get_user(
     user_id: str,
-    firebase_app=Depends(get_firebase_app)
+    repo: UserRepository = Depends(get_user_repository)
 ):
     """
     Get a specific user by ID.
     """
-    repo = UserRepository()
     return await repo.get_by_id(user_id)
 
+@router.get("/{user_id}/stats", response_model=UserStatsAggregate)
+async def get_user_stats(
+    user_id: str,
+    repo: UserRepository = Depends(get_user_repository)
+):
+    """
+    Get the aggregated answer statistics for a user.
+    """
+    return await repo.get_stats(user_id)
+
 @router.post("/", response_model=User, status_code=status.HTTP_201_CREATED)
 async def create_user(
     user: UserCreate,
-    firebase_app=Depends(get_firebase_app)
+    repo: UserRepository = Depends(get_user_repository)
 ):
     """
     Create a new user.
     """
-    repo = UserRepository()
     return await repo.create(user)
 
 @router.put("/{user_id}", response_model=User)
 async def update_user(
     user_id: str,
     user: UserUpdate,
-    firebase_app=Depends(get_firebase_app)
+    repo: UserRepository = Depends(get_user_repository)
 ):
     """
     Update a user.
     """
-    repo = UserRepository()
     return await repo.update(user_id, user) 
\ No newline at end of file
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ConfigDict
 from typing import List, Optional
 from datetime import datetime
 
@@ -32,6 +32,8 @@ class AttemptUpdate(BaseModel):
 
 class Attempt(AttemptBase):
     """Full attempt model with all fields."""
+    model_config = ConfigDict(extra="ignore")
+
     id: str
     user_id: str
     started_at: datetime = Field(default_factory=datetime.now)
@@ -40,8 +42,3 @@ class Attempt(AttemptBase):
     score: int = 0
     max_score: int = 0
     percentage: float = 0.0
-    
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        } 
\ No newline at end of file
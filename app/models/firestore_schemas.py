@@ -35,7 +35,7 @@ USER_SCHEMA = {
     "stats": {
         "total_questions_attempted": int,
         "correct_answers": int,
-        "accuracy": float,
+        # accuracy is derived from the counters on read and never stored
         "streak": int,  # Current daily streak
         "longest_streak": int,
         "xp": int,  # Experience points
@@ -46,7 +46,6 @@ USER_SCHEMA = {
         "anatomy": {
             "attempted": int,
             "correct": int,
-            "accuracy": float,
         },
         # Other categories...
     },
@@ -76,9 +75,24 @@ QUIZ_SCHEMA = {
         }
     ],
     "total_questions": int,
+    "play_count": int,  # Number of attempts started, bumped with Increment
     "active": bool,
 }
 
+# User Stats Aggregate Collection Schema (document ID is the user ID)
+USER_STATS_AGG_SCHEMA = {
+    "user_id": str,
+    "total_questions_attempted": int,
+    "correct_answers": int,
+    "category_stats": {
+        "anatomy": {
+            "attempted": int,
+            "correct": int,
+        },
+        # Other categories...
+    },
+}
+
 # Attempts Collection Schema
 ATTEMPT_SCHEMA = {
     "user_id": str,
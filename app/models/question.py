@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ConfigDict
 from typing import List, Optional
 from enum import Enum
 from datetime import datetime
@@ -49,14 +49,23 @@ class QuestionCreate(QuestionBase):
     options: List[Option]
 
 
+class QuestionSummary(BaseModel):
+    """List-view fields of a question, without its options and explanation."""
+    model_config = ConfigDict(extra="ignore")
+
+    id: str
+    text: str
+    category: Category = Category.GENERAL
+    difficulty: Difficulty = Difficulty.MEDIUM
+    tags: List[str] = []
+    created_at: datetime = Field(default_factory=datetime.now)
+
+
 class Question(QuestionBase):
     """Model for a complete question with ID and metadata."""
+    model_config = ConfigDict(extra="ignore")
+
     id: str
     options: List[Option]
     created_at: datetime = Field(default_factory=datetime.now)
     updated_at: Optional[datetime] = None
-
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        } 
\ No newline at end of file
@@ -1,7 +1,6 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ConfigDict
 from typing import List, Optional
 from datetime import datetime
-from enum import Enum
 
 from app.models.question import Category, Difficulty
 
@@ -43,15 +42,13 @@ class QuizUpdate(BaseModel):
 
 class Quiz(QuizBase):
     """Full quiz model with all fields."""
+    model_config = ConfigDict(extra="ignore")
+
     id: str
     created_by: str
     created_at: datetime = Field(default_factory=datetime.now)
     updated_at: Optional[datetime] = None
     questions: List[QuizQuestionRef]
     total_questions: int
+    play_count: int = 0
     active: bool = True
-    
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        } 
\ No newline at end of file
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr, Field
-from typing import Dict, List, Optional
+from pydantic import BaseModel, EmailStr, Field, ConfigDict, computed_field
+from typing import Dict, Optional
 from datetime import datetime
 from enum import Enum
 
@@ -14,18 +14,50 @@ class UserStats(BaseModel):
     """User statistics."""
     total_questions_attempted: int = 0
     correct_answers: int = 0
-    accuracy: float = 0.0
     streak: int = 0
     longest_streak: int = 0
     xp: int = 0
     level: int = 1
 
+    @computed_field
+    @property
+    def accuracy(self) -> float:
+        """Percentage of correct answers, derived from the counters."""
+        if self.total_questions_attempted <= 0:
+            return 0.0
+        return round(self.correct_answers / self.total_questions_attempted * 100, 2)
+
 
 class CategoryStats(BaseModel):
     """Statistics for a specific category."""
     attempted: int = 0
     correct: int = 0
-    accuracy: float = 0.0
+
+    @computed_field
+    @property
+    def accuracy(self) -> float:
+        """Percentage of correct answers in this category."""
+        if self.attempted <= 0:
+            return 0.0
+        return round(self.correct / self.attempted * 100, 2)
+
+
+class UserStatsAggregate(BaseModel):
+    """Answer counters for a user, pre-aggregated in the user_stats_agg collection."""
+    model_config = ConfigDict(extra="ignore")
+
+    user_id: str
+    total_questions_attempted: int = 0
+    correct_answers: int = 0
+    category_stats: Dict[str, CategoryStats] = Field(default_factory=dict)
+
+    @computed_field
+    @property
+    def accuracy(self) -> float:
+        """Percentage of correct answers across all categories."""
+        if self.total_questions_attempted <= 0:
+            return 0.0
+        return round(self.correct_answers / self.total_questions_attempted * 100, 2)
 
 
 class UserSettings(BaseModel):
@@ -55,6 +87,8 @@ class UserUpdate(BaseModel):
 
 class User(UserBase):
     """Full user model with all fields."""
+    model_config = ConfigDict(extra="ignore")
+
     id: str
     created_at: datetime = Field(default_factory=datetime.now)
     last_login: Optional[datetime] = None
@@ -62,8 +96,3 @@ class User(UserBase):
     stats: UserStats = Field(default_factory=UserStats)
     category_stats: Dict[str, CategoryStats] = Field(default_factory=dict)
     settings: UserSettings = Field(default_factory=UserSettings)
-    
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        } 
\ No newline at end of file
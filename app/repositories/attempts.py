@@ -1,71 +1,177 @@
 """
 Repository for attempt-related database operations with Firestore.
 """
-from typing import List, Dict, Any, Optional
-from datetime import datetime
+from typing import Dict, Any, Iterator, Optional
+from functools import lru_cache
+from itertools import chain
 
 from firebase_admin import firestore
 from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
 
 from app.models.attempt import Attempt, AttemptCreate, AttemptUpdate
+from app.models.question import Category
 from app.services.firebase_service import get_firestore_db
-from app.repositories.questions import QuestionRepository
-from app.repositories.quizzes import QuizRepository
-from app.repositories.users import UserRepository
+from app.repositories.questions import get_question_repository
+from app.repositories.quizzes import get_quiz_repository
+from app.repositories.users import get_user_repository
+
+@firestore.transactional
+def _apply_attempt_update(transaction, doc_ref, user_id: str, update_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Atomically read an attempt, check ownership, derive scoring fields and write the update.
+    
+    Args:
+        transaction: Firestore transaction to run in
+        doc_ref: Reference to the attempt document
+        user_id: The ID of the user updating the attempt
+        update_data: Fields to update (score already computed if answers were given)
+        
+    Returns:
+        The attempt data as stored after the update, including its ID
+        
+    Raises:
+        HTTPException: If attempt not found or user doesn't have permission
+    """
+    snapshot = doc_ref.get(transaction=transaction)
+    
+    if not snapshot.exists:
+        raise HTTPException(status_code=404, detail="Attempt not found")
+        
+    current = snapshot.to_dict()
+    
+    if current.get("user_id") != user_id:
+        raise HTTPException(status_code=403, detail="You don't have permission to update this attempt")
+    
+    # Work on a copy so a retried transaction starts from the original data
+    update_data = dict(update_data)
+    
+    # Calculate percentage
+    max_score = current.get("max_score", 0)
+    if "score" in update_data and max_score > 0:
+        update_data["percentage"] = round((update_data["score"] / max_score) * 100, 2)
+    
+    # Calculate time taken if completed
+    if update_data.get("completed_at") and current.get("started_at"):
+        start_time = current["started_at"]
+        end_time = update_data["completed_at"]
+        update_data["time_taken_seconds"] = int((end_time - start_time).total_seconds())
+    
+    transaction.update(doc_ref, update_data)
+    
+    return {**current, **update_data, "id": snapshot.id}
 
 class AttemptRepository:
-    """Repository for attempt-related operations."""
+    """
+    Repository for attempt-related operations.
+    
+    The Firestore client is synchronous, so every call into it is run in the
+    threadpool to keep the event loop free while waiting on the network.
+    """
 
     def __init__(self):
         self.db = get_firestore_db()
         self.collection = self.db.collection('attempts')
-        self.question_repo = QuestionRepository()
-        self.quiz_repo = QuizRepository()
-        self.user_repo = UserRepository()
+        # Reuse the shared repositories instead of building new ones per instance
+        self.question_repo = get_question_repository()
+        self.quiz_repo = get_quiz_repository()
+        self.user_repo = get_user_repository()
 
-    async def get_all_by_user(self, user_id: str, limit: int = 100) -> List[Attempt]:
+    async def stream_by_user(
+        self, 
+        user_id: str, 
+        limit: int = 100,
+        start_after: Optional[str] = None
+    ) -> Iterator[Attempt]:
         """
-        Get all attempts for a specific user.
+        Stream attempts for a specific user, newest first.
+        Attempts are yielded as Firestore returns them.
         
         Args:
             user_id: The ID of the user
             limit: Maximum number of attempts to return
+            start_after: ID of the last attempt of the previous page
             
         Returns:
-            List of Attempt objects
+            Blocking iterator of Attempt objects (consume it in the threadpool);
+            the query has already run, so its errors are raised here
+            
+        Raises:
+            HTTPException: If the start_after attempt doesn't exist
         """
         query = self.collection.where("user_id", "==", user_id).order_by("started_at", direction=firestore.Query.DESCENDING)
-        docs = query.limit(limit).get()
-        
-        attempts = []
-        for doc in docs:
-            doc_data = doc.to_dict()
-            doc_data["id"] = doc.id
-            attempts.append(Attempt.model_validate(doc_data))
-            
-        return attempts
+        query = await self._paginate(query, start_after)
+        return await self._stream(query.limit(limit))
 
-    async def get_all_by_quiz(self, quiz_id: str, limit: int = 100) -> List[Attempt]:
+    async def stream_by_quiz(
+        self, 
+        quiz_id: str, 
+        limit: int = 100,
+        start_after: Optional[str] = None
+    ) -> Iterator[Attempt]:
         """
-        Get all attempts for a specific quiz.
+        Stream attempts for a specific quiz, newest first.
+        Attempts are yielded as Firestore returns them.
         
         Args:
             quiz_id: The ID of the quiz
             limit: Maximum number of attempts to return
+            start_after: ID of the last attempt of the previous page
             
         Returns:
-            List of Attempt objects
+            Blocking iterator of Attempt objects (consume it in the threadpool);
+            the query has already run, so its errors are raised here
+            
+        Raises:
+            HTTPException: If the start_after attempt doesn't exist
         """
         query = self.collection.where("quiz_id", "==", quiz_id).order_by("started_at", direction=firestore.Query.DESCENDING)
-        docs = query.limit(limit).get()
+        query = await self._paginate(query, start_after)
+        return await self._stream(query.limit(limit))
+
+    async def _stream(self, query) -> Iterator[Attempt]:
+        """
+        Start a query and fetch its first attempt, then stream the rest.
         
-        attempts = []
-        for doc in docs:
+        A streamed response has already sent its 200 status when it pulls a chunk,
+        so query errors (e.g. a missing index) must surface before it is built.
+        """
+        attempts = self._iter_attempts(query)
+        first = await run_in_threadpool(next, attempts, None)
+        if first is None:
+            return iter(())
+        return chain((first,), attempts)
+
+    def _iter_attempts(self, query) -> Iterator[Attempt]:
+        """Yield Attempt objects from a query as its documents arrive."""
+        for doc in query.stream():
             doc_data = doc.to_dict()
             doc_data["id"] = doc.id
-            attempts.append(Attempt.model_validate(doc_data))
+            yield Attempt.model_validate(doc_data)
+
+    async def _paginate(self, query, start_after: Optional[str]):
+        """
+        Position a query after the given attempt (cursor pagination).
+        
+        Args:
+            query: The ordered Firestore query
+            start_after: ID of the last attempt of the previous page, if any
+            
+        Returns:
+            The query, starting after the cursor document
+            
+        Raises:
+            HTTPException: If the cursor attempt doesn't exist
+        """
+        if not start_after:
+            return query
+            
+        cursor = await run_in_threadpool(self.collection.document(start_after).get)
+        
+        if not cursor.exists:
+            raise HTTPException(status_code=400, detail="Invalid start_after cursor")
             
-        return attempts
+        return query.start_after(cursor)
 
     async def get_by_id(self, attempt_id: str) -> Attempt:
         """
@@ -80,7 +186,7 @@ class AttemptRepository:
         Raises:
             HTTPException: If attempt not found
         """
-        doc = self.collection.document(attempt_id).get()
+        doc = await run_in_threadpool(self.collection.document(attempt_id).get)
         
         if not doc.exists:
             raise HTTPException(status_code=404, detail="Attempt not found")
@@ -90,6 +196,28 @@ class AttemptRepository:
         
         return Attempt.model_validate(doc_data)
 
+    async def _get_owner(self, attempt_id: str) -> str:
+        """
+        Get the ID of the user who owns an attempt.
+        Only the user_id field is fetched, so permission checks skip the full document.
+        
+        Args:
+            attempt_id: The ID of the attempt
+            
+        Returns:
+            The owner's user ID
+            
+        Raises:
+            HTTPException: If attempt not found
+        """
+        doc_ref = self.collection.document(attempt_id)
+        doc = await run_in_threadpool(doc_ref.get, field_paths=["user_id"])
+        
+        if not doc.exists:
+            raise HTTPException(status_code=404, detail="Attempt not found")
+            
+        return doc.get("user_id")
+
     async def create(self, attempt: AttemptCreate, user_id: str) -> Attempt:
         """
         Create a new attempt.
@@ -104,10 +232,9 @@ class AttemptRepository:
         # Convert Pydantic model to dict
         attempt_dict = attempt.model_dump()
         
-        # Add user ID and timestamps
-        now = datetime.now()
+        # Add user ID and let Firestore stamp the start time
         attempt_dict["user_id"] = user_id
-        attempt_dict["started_at"] = now
+        attempt_dict["started_at"] = firestore.SERVER_TIMESTAMP
         
         # Initialize scoring fields
         attempt_dict["score"] = 0
@@ -116,19 +243,31 @@ class AttemptRepository:
         attempt_dict["time_taken_seconds"] = 0
         
         # Get quiz to set max score
+        quiz_found = False
         try:
             quiz = await self.quiz_repo.get_by_id(attempt.quiz_id)
             attempt_dict["max_score"] = quiz.total_questions
+            quiz_found = True
         except Exception:
             # If quiz not found, set max_score to 0
             pass
         
-        # Add to Firestore
+        # Add to Firestore, counting the play on the quiz in the same batch
         doc_ref = self.collection.document()
-        doc_ref.set(attempt_dict)
+        batch = self.db.batch()
+        batch.set(doc_ref, attempt_dict)
+        if quiz_found:
+            self.quiz_repo.increment_play_count(batch, attempt.quiz_id)
+        write_result = (await run_in_threadpool(batch.commit))[0]
+        if quiz_found:
+            # The cached quiz now has an outdated play_count
+            self.quiz_repo.invalidate(attempt.quiz_id)
         
-        # Return created attempt
-        return await self.get_by_id(doc_ref.id)
+        # Return created attempt without re-reading it; the server timestamp
+        # resolves to the commit time of this write
+        attempt_dict["started_at"] = write_result.update_time
+        attempt_dict["id"] = doc_ref.id
+        return Attempt.model_validate(attempt_dict)
 
     async def update(self, attempt_id: str, attempt_data: AttemptUpdate, user_id: str) -> Attempt:
         """
@@ -145,57 +284,57 @@ class AttemptRepository:
         Raises:
             HTTPException: If attempt not found or user doesn't have permission
         """
-        # Check if attempt exists and user has permission
-        current_attempt = await self.get_by_id(attempt_id)
-        
-        if current_attempt.user_id != user_id:
-            raise HTTPException(status_code=403, detail="You don't have permission to update this attempt")
-        
         # Prepare update data
         update_data = attempt_data.model_dump(exclude_unset=True)
         
-        # If attempt is being completed, calculate score
-        if update_data.get("completed_at") or update_data.get("answers"):
-            # Get the latest data
-            attempt = await self.get_by_id(attempt_id)
-            
-            # Calculate score if answers are provided
-            if update_data.get("answers"):
-                correct_answers = sum(1 for answer in update_data["answers"] if answer["is_correct"])
-                update_data["score"] = correct_answers
-                
-                # Calculate percentage
-                if attempt.max_score > 0:
-                    update_data["percentage"] = round((correct_answers / attempt.max_score) * 100, 2)
-                
-                # Update user stats for each answered question
-                for answer in update_data["answers"]:
-                    if "question_id" in answer:
-                        # Get question to get category
-                        try:
-                            question = await self.question_repo.get_by_id(answer["question_id"])
-                            await self.user_repo.update_stats(
-                                user_id=user_id,
-                                question_id=answer["question_id"],
-                                category=question.category.value,
-                                is_correct=answer["is_correct"]
-                            )
-                        except Exception:
-                            # If question not found, skip updating stats
-                            pass
-            
-            # Calculate time taken if completed
-            if update_data.get("completed_at"):
-                start_time = attempt.started_at
-                end_time = update_data["completed_at"]
-                update_data["time_taken_seconds"] = int((end_time - start_time).total_seconds())
-        
-        # Update the document
+        # Count correct answers and collect question references in one pass
+        answered = []
+        refs = []
+        if update_data.get("answers"):
+            correct_answers = 0
+            for answer in update_data["answers"]:
+                correct_answers += answer["is_correct"]
+                if "question_id" in answer:
+                    answered.append(answer)
+                    refs.append(self.question_repo.collection.document(answer["question_id"]))
+                    
+            update_data["score"] = correct_answers
+        
+        # Check permission, derive percentage/time taken and write in one transaction
         doc_ref = self.collection.document(attempt_id)
-        doc_ref.update(update_data)
+        attempt_dict = await run_in_threadpool(
+            lambda: _apply_attempt_update(self.db.transaction(), doc_ref, user_id, update_data)
+        )
         
-        # Return updated attempt
-        return await self.get_by_id(attempt_id)
+        if answered:
+            # Read the categories of all answered questions in one batched call
+            snapshots = await run_in_threadpool(
+                lambda: list(self.db.get_all(refs, field_paths=["category"]))
+            )
+            # Questions stored without a category count towards the general one
+            categories = {
+                snap.id: (snap.to_dict() or {}).get("category", Category.GENERAL.value)
+                for snap in snapshots
+                if snap.exists
+            }
+
+            # If question not found, skip updating stats for that answer
+            results = [
+                (categories[answer["question_id"]], answer["is_correct"])
+                for answer in answered
+                if answer["question_id"] in categories
+            ]
+
+            # Update user stats for all answered questions in a single write
+            if results:
+                try:
+                    await self.user_repo.update_stats_batch(user_id, results)
+                except Exception:
+                    # If user not found, skip updating stats
+                    pass
+        
+        # Return updated attempt from the data the transaction already read
+        return Attempt.model_validate(attempt_dict)
 
     async def delete(self, attempt_id: str, user_id: str) -> bool:
         """
@@ -212,13 +351,19 @@ class AttemptRepository:
             HTTPException: If attempt not found or user doesn't have permission
         """
         # Check if attempt exists and user has permission
-        attempt = await self.get_by_id(attempt_id)
-        
-        if attempt.user_id != user_id:
+        if await self._get_owner(attempt_id) != user_id:
             raise HTTPException(status_code=403, detail="You don't have permission to delete this attempt")
         
         # Hard delete
         doc_ref = self.collection.document(attempt_id)
-        doc_ref.delete()
+        await run_in_threadpool(doc_ref.delete)
         
-        return True 
\ No newline at end of file
+        return True
+
+
+@lru_cache()
+def get_attempt_repository() -> AttemptRepository:
+    """
+    Get the shared AttemptRepository instance, created once per worker.
+    """
+    return AttemptRepository()
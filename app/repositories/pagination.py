@@ -0,0 +1,92 @@
+"""
+Cursor-based pagination helpers for Firestore list queries.
+
+Pages are ordered by creation time (document ID as tie-breaker) and continued
+with start_after, so the cost of a page doesn't grow with how deep it is.
+Offsets are intentionally not supported: Firestore bills for every skipped document.
+"""
+import base64
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import orjson
+from fastapi import HTTPException
+
+# Response header carrying the cursor of the next page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(created_at: datetime, doc_id: str) -> str:
+    """
+    Encode the ordering fields of the last document of a page as an opaque cursor.
+
+    Args:
+        created_at: Creation time of the document
+        doc_id: ID of the document
+
+    Returns:
+        URL-safe cursor string
+    """
+    payload = orjson.dumps({"created_at": created_at.isoformat(), "id": doc_id})
+    return base64.urlsafe_b64encode(payload).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Args:
+        cursor: The cursor string
+
+    Returns:
+        Tuple of (created_at, doc_id)
+
+    Raises:
+        HTTPException: If the cursor is malformed
+    """
+    try:
+        payload = orjson.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(payload["created_at"]), payload["id"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def paginate(query, collection, cursor: Optional[str] = None):
+    """
+    Order a query for pagination and start it after the cursor, if given.
+
+    Args:
+        query: The filtered Firestore query
+        collection: The collection being queried, to resolve the cursor document
+        cursor: Cursor returned with the previous page
+
+    Returns:
+        The ordered query, positioned after the cursor
+
+    Raises:
+        HTTPException: If the cursor is malformed
+    """
+    query = query.order_by("created_at").order_by("__name__")
+
+    if cursor:
+        created_at, doc_id = decode_cursor(cursor)
+        query = query.start_after({"created_at": created_at, "__name__": collection.document(doc_id)})
+
+    return query
+
+
+def next_cursor(items: List, limit: int) -> Optional[str]:
+    """
+    Get the cursor for the page after items.
+
+    Args:
+        items: The models returned for the current page
+        limit: The page size that was requested
+
+    Returns:
+        Cursor string, or None if this was the last page
+    """
+    if len(items) < limit or not items:
+        return None
+    last = items[-1]
+    return encode_cursor(last.created_at, last.id)
@@ -1,15 +1,86 @@
 """
 Repository for question-related database operations with Firestore.
 """
-from typing import List, Dict, Any, Optional
-from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple, Union
+from datetime import datetime, timezone
+from functools import lru_cache
+from threading import Lock
 import uuid
 
 from firebase_admin import firestore
+from cachetools import TTLCache
 from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from google.api_core.exceptions import NotFound
+from pydantic import TypeAdapter
 
-from app.models.question import Question, QuestionCreate, Category, Difficulty
+from app.models.question import Question, QuestionCreate, QuestionSummary, Option, OptionType, Category, Difficulty
 from app.services.firebase_service import get_firestore_db
+from app.repositories.pagination import paginate, next_cursor
+
+QUESTION_LIST_ADAPTER = TypeAdapter(List[Question])
+QUESTION_SUMMARY_LIST_ADAPTER = TypeAdapter(List[QuestionSummary])
+
+# Firestore's limit on the number of writes in one batch
+MAX_BATCH_WRITES = 500
+
+# Fields fetched for summary listings; options are the bulkiest part of a question
+SUMMARY_FIELDS = ["text", "category", "difficulty", "tags", "created_at"]
+
+# Firestore's limit on the number of values in an array_contains_any filter
+MAX_TAG_FILTERS = 10
+
+# Recently read questions, keyed by document ID; dropped on update/delete
+_cache = TTLCache(maxsize=4096, ttl=30)
+_cache_lock = Lock()
+
+def _invalidate(question_id: str) -> None:
+    """Drop a question from the read cache after it was written."""
+    with _cache_lock:
+        _cache.pop(question_id, None)
+
+def _construct_question(doc) -> Question:
+    """
+    Build a Question from a stored document without re-validating it.
+    
+    Documents were validated when they were written, so only the nested options
+    and enum fields are converted; everything else is copied as is.
+    
+    Args:
+        doc: Firestore document snapshot of the question
+        
+    Returns:
+        Question object
+    """
+    data = doc.to_dict()
+    data["id"] = doc.id
+    data["category"] = Category(data.get("category", Category.GENERAL))
+    data["difficulty"] = Difficulty(data.get("difficulty", Difficulty.MEDIUM))
+    data["options"] = [
+        Option.model_construct(**{**option, "option_type": OptionType(option.get("option_type", OptionType.TEXT))})
+        for option in data.get("options", [])
+    ]
+    return Question.model_construct(**data)
+
+@firestore.transactional
+def _apply_question_update(transaction, doc_ref, update_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Atomically check a question exists and apply an update to it.
+    
+    Returns:
+        The question data as stored after the update, including its ID
+        
+    Raises:
+        HTTPException: If question not found
+    """
+    snapshot = doc_ref.get(transaction=transaction)
+    
+    if not snapshot.exists:
+        raise HTTPException(status_code=404, detail="Question not found")
+        
+    transaction.update(doc_ref, update_data)
+    
+    return {**snapshot.to_dict(), **update_data, "id": snapshot.id}
 
 class QuestionRepository:
     """Repository for question-related operations."""
@@ -17,49 +88,87 @@ class QuestionRepository:
     def __init__(self):
         self.db = get_firestore_db()
         self.collection = self.db.collection('questions')
+        # Filtered base queries, keyed by (category, difficulty); queries are immutable so they can be shared
+        self._base_queries = {}
+
+    def _base_query(self, category: Optional[Category], difficulty: Optional[Difficulty]):
+        """
+        Get the active-questions query with the category/difficulty filters applied.
+        There are only a few dozen combinations, so each is built once and reused.
+        """
+        key = (category, difficulty)
+        query = self._base_queries.get(key)
+        if query is None:
+            query = self.collection.where("active", "==", True)
+            
+            if category:
+                query = query.where("category", "==", category.value)
+                
+            if difficulty:
+                query = query.where("difficulty", "==", difficulty.value)
+                
+            self._base_queries[key] = query
+        return query
 
     async def get_all(
         self, 
         limit: int = 100, 
         category: Optional[Category] = None,
         difficulty: Optional[Difficulty] = None,
-        tags: Optional[List[str]] = None
-    ) -> List[Question]:
+        tags: Optional[List[str]] = None,
+        match_all: bool = False,
+        cursor: Optional[str] = None,
+        summary: bool = False
+    ) -> Tuple[List[Union[Question, QuestionSummary]], Optional[str]]:
         """
-        Get all questions with optional filtering.
+        Get a page of questions with optional filtering, oldest first.
         
         Args:
             limit: Maximum number of questions to return
             category: Filter by category
             difficulty: Filter by difficulty
-            tags: Filter by tags
+            tags: Filter by tags (at most 10); matches any of them unless match_all is set
+            match_all: Only return questions that have every tag
+            cursor: Cursor returned with the previous page
+            summary: Only fetch the SUMMARY_FIELDS and return QuestionSummary objects
             
         Returns:
-            List of Question objects
-        """
-        query = self.collection.where("active", "==", True)
-        
-        if category:
-            query = query.where("category", "==", category.value)
+            Tuple of (list of Question or QuestionSummary objects, cursor for the next page or None)
             
-        if difficulty:
-            query = query.where("difficulty", "==", difficulty.value)
+        Raises:
+            HTTPException: If the cursor is malformed or too many tags are given
+        """
+        query = self._base_query(category, difficulty)
             
-        # Filter by tags - Firestore requires special handling for array contains
-        if tags and len(tags) == 1:
-            query = query.where("tags", "array_contains", tags[0])
+        # Filter by tags in the query; Firestore allows a single array filter,
+        # so for match_all the remaining tags are checked on the returned page
+        if tags:
+            if len(tags) > MAX_TAG_FILTERS:
+                raise HTTPException(status_code=400, detail=f"At most {MAX_TAG_FILTERS} tags can be filtered on")
+            if match_all:
+                query = query.where("tags", "array_contains", tags[0])
+            else:
+                query = query.where("tags", "array_contains_any", tags)
+        
+        # Get the documents, projected to the list-view fields if only a summary is needed
+        query = paginate(query, self.collection, cursor)
+        if summary:
+            query = query.select(SUMMARY_FIELDS)
+        query = query.limit(limit)
         
-        # Get the documents
-        docs = query.limit(limit).get()
+        # Convert to Question objects while the documents stream in
+        if summary:
+            raw = await run_in_threadpool(lambda: [{**doc.to_dict(), "id": doc.id} for doc in query.stream()])
+            questions = QUESTION_SUMMARY_LIST_ADAPTER.validate_python(raw)
+        else:
+            questions = await run_in_threadpool(lambda: [_construct_question(doc) for doc in query.stream()])
+        cursor = next_cursor(questions, limit)
         
-        # Convert to Question objects
-        questions = []
-        for doc in docs:
-            doc_data = doc.to_dict()
-            doc_data["id"] = doc.id
-            questions.append(Question.model_validate(doc_data))
+        if match_all and tags and len(tags) > 1:
+            required = set(tags[1:])
+            questions = [question for question in questions if required.issubset(question.tags)]
             
-        return questions
+        return questions, cursor
 
     async def get_by_id(self, question_id: str) -> Question:
         """
@@ -74,7 +183,12 @@ class QuestionRepository:
         Raises:
             HTTPException: If question not found
         """
-        doc = self.collection.document(question_id).get()
+        with _cache_lock:
+            cached = _cache.get(question_id)
+        if cached is not None:
+            return cached
+            
+        doc = await run_in_threadpool(self.collection.document(question_id).get)
         
         if not doc.exists:
             raise HTTPException(status_code=404, detail="Question not found")
@@ -82,46 +196,119 @@ class QuestionRepository:
         doc_data = doc.to_dict()
         doc_data["id"] = doc.id
         
-        return Question.model_validate(doc_data)
+        question = Question.model_validate(doc_data)
+        with _cache_lock:
+            _cache[question_id] = question
+        return question
 
-    async def create(self, question: QuestionCreate) -> Question:
+    async def get_many(self, question_ids: List[str]) -> List[Question]:
         """
-        Create a new question.
+        Get several questions by ID with a single batched read.
         
         Args:
-            question: QuestionCreate object
+            question_ids: The IDs of the questions
             
         Returns:
-            Created Question object
+            List of Question objects in the order of question_ids; missing questions are skipped
+        """
+        # Serve what we can from the cache and fetch the rest in one call
+        with _cache_lock:
+            found = {question_id: _cache.get(question_id) for question_id in question_ids}
+        missing = [question_id for question_id, question in found.items() if question is None]
+        
+        if missing:
+            refs = [self.collection.document(question_id) for question_id in missing]
+            docs = await run_in_threadpool(lambda: list(self.db.get_all(refs)))
+            
+            fetched = [_construct_question(doc) for doc in docs if doc.exists]
+            with _cache_lock:
+                for question in fetched:
+                    _cache[question.id] = question
+                    found[question.id] = question
+        
+        return [found[question_id] for question_id in question_ids if found[question_id] is not None]
+
+    def _prepare(self, question: QuestionCreate) -> Dict[str, Any]:
         """
-        # Convert Pydantic model to dict
-        question_dict = question.model_dump()
+        Build the document to store for a new question.
         
-        # Convert enum values to strings
-        if isinstance(question_dict.get("category"), Category):
-            question_dict["category"] = question_dict["category"].value
+        Args:
+            question: QuestionCreate object
             
-        if isinstance(question_dict.get("difficulty"), Difficulty):
-            question_dict["difficulty"] = question_dict["difficulty"].value
+        Returns:
+            Dict ready to be written to Firestore
+        """
+        # Convert Pydantic model to a Firestore-ready dict (enums as their values)
+        question_dict = question.model_dump(mode="json")
         
-        # Add timestamps and active flag
-        now = datetime.now()
-        question_dict["created_at"] = now
-        question_dict["updated_at"] = now
+        # Add timestamps (stamped by Firestore on write) and active flag
+        question_dict["created_at"] = firestore.SERVER_TIMESTAMP
+        question_dict["updated_at"] = firestore.SERVER_TIMESTAMP
         question_dict["active"] = True
         
         # Generate IDs for options
         for option in question_dict.get("options", []):
             if not option.get("id"):
-                option["id"] = str(uuid.uuid4())
+                option["id"] = uuid.uuid4().hex
+                
+        return question_dict
+
+    async def create(self, question: QuestionCreate) -> Question:
+        """
+        Create a new question.
+        
+        Args:
+            question: QuestionCreate object
+            
+        Returns:
+            Created Question object
+        """
+        question_dict = self._prepare(question)
         
         # Add to Firestore
         doc_ref = self.collection.document()
-        doc_ref.set(question_dict)
+        write_result = await run_in_threadpool(doc_ref.set, question_dict)
+        
+        # Return created question without re-reading it, with the commit time as its timestamps
+        question_dict["created_at"] = question_dict["updated_at"] = write_result.update_time
+        question_dict["id"] = doc_ref.id
+        return Question.model_validate(question_dict)
+
+    async def create_many(
+        self, 
+        questions: List[QuestionCreate], 
+        question_ids: Optional[List[str]] = None
+    ) -> List[Question]:
+        """
+        Create several questions, writing them in batches instead of one call each.
+        
+        Each batch is atomic, but a failure in a later batch doesn't undo earlier ones.
+        
+        Args:
+            questions: QuestionCreate objects
+            question_ids: Document IDs to use, one per question; generated if not given
+            
+        Returns:
+            Created Question objects, in the same order
+        """
+        created = []
         
-        # Return created question
-        created_question = await self.get_by_id(doc_ref.id)
-        return created_question
+        for start in range(0, len(questions), MAX_BATCH_WRITES):
+            batch = self.db.batch()
+            pending = []
+            for index in range(start, min(start + MAX_BATCH_WRITES, len(questions))):
+                question_dict = self._prepare(questions[index])
+                doc_ref = self.collection.document(question_ids[index] if question_ids else None)
+                batch.set(doc_ref, question_dict)
+                pending.append({**question_dict, "id": doc_ref.id})
+            write_results = await run_in_threadpool(batch.commit)
+            
+            # Write results come back in the order the writes were added
+            for question_dict, write_result in zip(pending, write_results):
+                question_dict["created_at"] = question_dict["updated_at"] = write_result.update_time
+                created.append(question_dict)
+        
+        return QUESTION_LIST_ADAPTER.validate_python(created)
 
     async def update(self, question_id: str, question_data: Dict[str, Any]) -> Question:
         """
@@ -129,7 +316,7 @@ class QuestionRepository:
         
         Args:
             question_id: The ID of the question to update
-            question_data: Dict with fields to update
+            question_data: Dict with fields to update, enums already dumped to their values
             
         Returns:
             Updated Question object
@@ -137,31 +324,24 @@ class QuestionRepository:
         Raises:
             HTTPException: If question not found
         """
-        # Check if question exists
-        doc_ref = self.collection.document(question_id)
-        doc = doc_ref.get()
-        
-        if not doc.exists:
-            raise HTTPException(status_code=404, detail="Question not found")
-        
         # Prepare update data
         update_data = question_data.copy()
         
-        # Convert enum values to strings
-        if isinstance(update_data.get("category"), Category):
-            update_data["category"] = update_data["category"].value
-            
-        if isinstance(update_data.get("difficulty"), Difficulty):
-            update_data["difficulty"] = update_data["difficulty"].value
-        
         # Add updated timestamp
-        update_data["updated_at"] = datetime.now()
+        update_data["updated_at"] = firestore.SERVER_TIMESTAMP
         
-        # Update the document
-        doc_ref.update(update_data)
+        # Check existence and update in one transaction
+        doc_ref = self.collection.document(question_id)
+        question_dict = await run_in_threadpool(
+            lambda: _apply_question_update(self.db.transaction(), doc_ref, update_data)
+        )
+        _invalidate(question_id)
         
-        # Return updated question
-        return await self.get_by_id(question_id)
+        # The transaction doesn't expose its commit time, so use the local clock for the response
+        question_dict["updated_at"] = datetime.now(timezone.utc)
+        
+        # Return updated question from the data the transaction already read
+        return Question.model_validate(question_dict)
 
     async def delete(self, question_id: str) -> bool:
         """
@@ -176,17 +356,23 @@ class QuestionRepository:
         Raises:
             HTTPException: If question not found
         """
-        # Check if question exists
+        # Soft delete by setting active=False; update fails if the question doesn't exist
         doc_ref = self.collection.document(question_id)
-        doc = doc_ref.get()
-        
-        if not doc.exists:
+        try:
+            await run_in_threadpool(doc_ref.update, {
+                "active": False,
+                "updated_at": firestore.SERVER_TIMESTAMP
+            })
+        except NotFound:
             raise HTTPException(status_code=404, detail="Question not found")
+        _invalidate(question_id)
         
-        # Soft delete by setting active=False
-        doc_ref.update({
-            "active": False,
-            "updated_at": datetime.now()
-        })
-        
-        return True 
\ No newline at end of file
+        return True
+
+
+@lru_cache()
+def get_question_repository() -> QuestionRepository:
+    """
+    Get the shared QuestionRepository instance, created once per worker.
+    """
+    return QuestionRepository()
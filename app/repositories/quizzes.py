@@ -1,14 +1,65 @@
 """
 Repository for quiz-related database operations with Firestore.
 """
-from typing import List, Dict, Any, Optional
-from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+from datetime import datetime, timezone
+from functools import lru_cache
+from threading import Lock
 
 from firebase_admin import firestore
+from cachetools import TTLCache
 from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from pydantic import TypeAdapter
 
 from app.models.quiz import Quiz, QuizCreate, QuizUpdate, Category, Difficulty
 from app.services.firebase_service import get_firestore_db
+from app.repositories.pagination import paginate, next_cursor
+from app.repositories.questions import MAX_TAG_FILTERS
+
+QUIZ_LIST_ADAPTER = TypeAdapter(List[Quiz])
+
+# Recently read quizzes, keyed by document ID; dropped on update/delete
+_cache = TTLCache(maxsize=4096, ttl=30)
+_cache_lock = Lock()
+
+def _invalidate(quiz_id: str) -> None:
+    """Drop a quiz from the read cache after it was written."""
+    with _cache_lock:
+        _cache.pop(quiz_id, None)
+
+@firestore.transactional
+def _apply_quiz_update(transaction, doc_ref, user_id: str, update_data: Dict[str, Any], action: str) -> Dict[str, Any]:
+    """
+    Atomically check a quiz exists and belongs to the user, then apply an update to it.
+    
+    Args:
+        transaction: Firestore transaction to run in
+        doc_ref: Reference to the quiz document
+        user_id: The ID of the user changing the quiz
+        update_data: Fields to update
+        action: What the user is doing ("update" or "delete"), for the permission error
+        
+    Returns:
+        The quiz data as stored after the update, including its ID
+        
+    Raises:
+        HTTPException: If quiz not found or user doesn't have permission
+    """
+    snapshot = doc_ref.get(transaction=transaction)
+    
+    if not snapshot.exists:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+        
+    quiz_data = snapshot.to_dict()
+    
+    # Check if user has permission
+    if quiz_data.get("created_by") != user_id:
+        raise HTTPException(status_code=403, detail=f"You don't have permission to {action} this quiz")
+        
+    transaction.update(doc_ref, update_data)
+    
+    return {**quiz_data, **update_data, "id": snapshot.id}
 
 class QuizRepository:
     """Repository for quiz-related operations."""
@@ -16,6 +67,30 @@ class QuizRepository:
     def __init__(self):
         self.db = get_firestore_db()
         self.collection = self.db.collection('quizzes')
+        # Reusable filter chains for get_all, built on first use
+        self._base_queries = {}
+
+    def _base_query(self, only_public: bool, category: Optional[Category], difficulty: Optional[Difficulty]):
+        """
+        Get the active-quizzes query with the visibility, category and difficulty filters applied.
+        Firestore queries are immutable, so each combination is built once and shared.
+        """
+        key = (only_public, category, difficulty)
+        query = self._base_queries.get(key)
+        if query is None:
+            query = self.collection.where("active", "==", True)
+            
+            if only_public:
+                query = query.where("is_public", "==", True)
+                
+            if category:
+                query = query.where("category", "==", category.value)
+                
+            if difficulty:
+                query = query.where("difficulty", "==", difficulty.value)
+                
+            self._base_queries[key] = query
+        return query
 
     async def get_all(
         self, 
@@ -23,47 +98,56 @@ class QuizRepository:
         category: Optional[Category] = None,
         difficulty: Optional[Difficulty] = None,
         tags: Optional[List[str]] = None,
-        only_public: bool = True
-    ) -> List[Quiz]:
+        only_public: bool = True,
+        match_all: bool = False,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Quiz], Optional[str]]:
         """
-        Get all quizzes with optional filtering.
+        Get a page of quizzes with optional filtering, oldest first.
         
         Args:
             limit: Maximum number of quizzes to return
             category: Filter by category
             difficulty: Filter by difficulty
-            tags: Filter by tags
+            tags: Filter by tags (at most 10); matches any of them unless match_all is set
             only_public: Only return public quizzes
+            match_all: Only return quizzes that have every tag
+            cursor: Cursor returned with the previous page
             
         Returns:
-            List of Quiz objects
-        """
-        query = self.collection.where("active", "==", True)
-        
-        if only_public:
-            query = query.where("is_public", "==", True)
-            
-        if category:
-            query = query.where("category", "==", category.value)
+            Tuple of (list of Quiz objects, cursor for the next page or None)
             
-        if difficulty:
-            query = query.where("difficulty", "==", difficulty.value)
+        Raises:
+            HTTPException: If the cursor is malformed or too many tags are given
+        """
+        query = self._base_query(only_public, category, difficulty)
             
-        # Filter by tags
-        if tags and len(tags) == 1:
-            query = query.where("tags", "array_contains", tags[0])
+        # Filter by tags; with match_all only the first tag can go in the query
+        if tags:
+            if len(tags) > MAX_TAG_FILTERS:
+                raise HTTPException(status_code=400, detail=f"At most {MAX_TAG_FILTERS} tags can be filtered on")
+            if match_all:
+                query = query.where("tags", "array_contains", tags[0])
+            else:
+                query = query.where("tags", "array_contains_any", tags)
+        
+        # Position the query on the requested page
+        query = paginate(query, self.collection, cursor)
         
-        # Get the documents
-        docs = query.limit(limit).get()
+        # Convert to Quiz objects as the documents stream in
+        raw = await run_in_threadpool(
+            lambda: [{**doc.to_dict(), "id": doc.id} for doc in query.limit(limit).stream()]
+        )
+        quizzes = QUIZ_LIST_ADAPTER.validate_python(raw)
+        cursor = next_cursor(quizzes, limit)
         
-        # Convert to Quiz objects
-        quizzes = []
-        for doc in docs:
-            doc_data = doc.to_dict()
-            doc_data["id"] = doc.id
-            quizzes.append(Quiz.model_validate(doc_data))
+        # The page cursor comes from the unfiltered page, so dropping quizzes
+        # here can shorten a page without ending the listing
+        if match_all and tags and len(tags) > 1:
+            required = set(tags[1:])
+            quizzes = [quiz for quiz in quizzes if required.issubset(quiz.tags)]
             
-        return quizzes
+        return quizzes, cursor
 
     async def get_by_id(self, quiz_id: str) -> Quiz:
         """
@@ -78,7 +162,12 @@ class QuizRepository:
         Raises:
             HTTPException: If quiz not found
         """
-        doc = self.collection.document(quiz_id).get()
+        with _cache_lock:
+            cached = _cache.get(quiz_id)
+        if cached is not None:
+            return cached
+            
+        doc = await run_in_threadpool(self.collection.document(quiz_id).get)
         
         if not doc.exists:
             raise HTTPException(status_code=404, detail="Quiz not found")
@@ -86,7 +175,10 @@ class QuizRepository:
         doc_data = doc.to_dict()
         doc_data["id"] = doc.id
         
-        return Quiz.model_validate(doc_data)
+        quiz = Quiz.model_validate(doc_data)
+        with _cache_lock:
+            _cache[quiz_id] = quiz
+        return quiz
 
     async def get_by_user(
         self, 
@@ -110,15 +202,11 @@ class QuizRepository:
         if not include_private:
             query = query.where("is_public", "==", True)
             
-        docs = query.limit(limit).get()
-        
-        quizzes = []
-        for doc in docs:
-            doc_data = doc.to_dict()
-            doc_data["id"] = doc.id
-            quizzes.append(Quiz.model_validate(doc_data))
-            
-        return quizzes
+        # Convert to Quiz objects as the documents stream in
+        raw = await run_in_threadpool(
+            lambda: [{**doc.to_dict(), "id": doc.id} for doc in query.limit(limit).stream()]
+        )
+        return QUIZ_LIST_ADAPTER.validate_python(raw)
 
     async def create(self, quiz: QuizCreate, user_id: str) -> Quiz:
         """
@@ -131,21 +219,13 @@ class QuizRepository:
         Returns:
             Created Quiz object
         """
-        # Convert Pydantic model to dict
-        quiz_dict = quiz.model_dump()
+        # Convert Pydantic model to dict; JSON mode turns enums into their values
+        quiz_dict = quiz.model_dump(mode="json")
         
-        # Convert enum values to strings
-        if isinstance(quiz_dict.get("category"), Category):
-            quiz_dict["category"] = quiz_dict["category"].value
-            
-        if isinstance(quiz_dict.get("difficulty"), Difficulty):
-            quiz_dict["difficulty"] = quiz_dict["difficulty"].value
-        
-        # Add user ID and timestamps
-        now = datetime.now()
+        # Add user ID and let Firestore stamp the timestamps
         quiz_dict["created_by"] = user_id
-        quiz_dict["created_at"] = now
-        quiz_dict["updated_at"] = now
+        quiz_dict["created_at"] = firestore.SERVER_TIMESTAMP
+        quiz_dict["updated_at"] = firestore.SERVER_TIMESTAMP
         quiz_dict["active"] = True
         
         # Calculate total questions
@@ -153,10 +233,12 @@ class QuizRepository:
         
         # Add to Firestore
         doc_ref = self.collection.document()
-        doc_ref.set(quiz_dict)
+        write_result = await run_in_threadpool(doc_ref.set, quiz_dict)
         
-        # Return created quiz
-        return await self.get_by_id(doc_ref.id)
+        # Return created quiz without re-reading it; both timestamps resolve to the write time
+        quiz_dict["created_at"] = quiz_dict["updated_at"] = write_result.update_time
+        quiz_dict["id"] = doc_ref.id
+        return Quiz.model_validate(quiz_dict)
 
     async def update(self, quiz_id: str, quiz_data: QuizUpdate, user_id: str) -> Quiz:
         """
@@ -173,41 +255,28 @@ class QuizRepository:
         Raises:
             HTTPException: If quiz not found or user doesn't have permission
         """
-        # Check if quiz exists and user has permission
-        doc_ref = self.collection.document(quiz_id)
-        doc = doc_ref.get()
-        
-        if not doc.exists:
-            raise HTTPException(status_code=404, detail="Quiz not found")
-            
-        quiz_data_dict = doc.to_dict()
-        
-        # Check if user has permission to update
-        if quiz_data_dict.get("created_by") != user_id:
-            raise HTTPException(status_code=403, detail="You don't have permission to update this quiz")
-        
         # Prepare update data
-        update_data = quiz_data.model_dump(exclude_unset=True)
-        
-        # Convert enum values to strings
-        if isinstance(update_data.get("category"), Category):
-            update_data["category"] = update_data["category"].value
-            
-        if isinstance(update_data.get("difficulty"), Difficulty):
-            update_data["difficulty"] = update_data["difficulty"].value
+        update_data = quiz_data.model_dump(mode="json", exclude_unset=True)
         
         # Update total questions if questions were updated
         if "questions" in update_data:
             update_data["total_questions"] = len(update_data["questions"])
         
         # Add updated timestamp
-        update_data["updated_at"] = datetime.now()
+        update_data["updated_at"] = firestore.SERVER_TIMESTAMP
+        
+        # Check existence and permission, then update, in one transaction
+        doc_ref = self.collection.document(quiz_id)
+        quiz_dict = await run_in_threadpool(
+            lambda: _apply_quiz_update(self.db.transaction(), doc_ref, user_id, update_data, "update")
+        )
+        _invalidate(quiz_id)
         
-        # Update the document
-        doc_ref.update(update_data)
+        # Stand in for the server timestamp, which isn't known until the document is read back
+        quiz_dict["updated_at"] = datetime.now(timezone.utc)
         
-        # Return updated quiz
-        return await self.get_by_id(quiz_id)
+        # Return updated quiz from the data the transaction already read
+        return Quiz.model_validate(quiz_dict)
 
     async def delete(self, quiz_id: str, user_id: str) -> bool:
         """
@@ -223,23 +292,44 @@ class QuizRepository:
         Raises:
             HTTPException: If quiz not found or user doesn't have permission
         """
-        # Check if quiz exists and user has permission
+        # Soft delete by setting active=False, checking permission in the same transaction
         doc_ref = self.collection.document(quiz_id)
-        doc = doc_ref.get()
+        update_data = {
+            "active": False,
+            "updated_at": firestore.SERVER_TIMESTAMP
+        }
+        await run_in_threadpool(
+            lambda: _apply_quiz_update(self.db.transaction(), doc_ref, user_id, update_data, "delete")
+        )
+        _invalidate(quiz_id)
         
-        if not doc.exists:
-            raise HTTPException(status_code=404, detail="Quiz not found")
-            
-        quiz_data = doc.to_dict()
+        return True
+
+    def increment_play_count(self, batch, quiz_id: str) -> None:
+        """
+        Add a play count bump for a quiz to a write batch.
         
-        # Check if user has permission to delete
-        if quiz_data.get("created_by") != user_id:
-            raise HTTPException(status_code=403, detail="You don't have permission to delete this quiz")
+        The cached quiz goes stale once the batch commits, so call invalidate afterwards.
         
-        # Soft delete by setting active=False
-        doc_ref.update({
-            "active": False,
-            "updated_at": datetime.now()
-        })
+        Args:
+            batch: Firestore write batch to add the update to
+            quiz_id: The ID of the quiz that was played
+        """
+        batch.update(self.collection.document(quiz_id), {"play_count": firestore.Increment(1)})
+
+    def invalidate(self, quiz_id: str) -> None:
+        """
+        Drop a quiz from the read cache after it was written outside this repository.
         
-        return True 
\ No newline at end of file
+        Args:
+            quiz_id: The ID of the quiz
+        """
+        _invalidate(quiz_id)
+
+
+@lru_cache()
+def get_quiz_repository() -> QuizRepository:
+    """
+    Get the shared QuizRepository instance, created once per worker.
+    """
+    return QuizRepository()
@@ -1,16 +1,101 @@
 """
 Repository for user-related database operations with Firestore.
 """
-from typing import Dict, List, Optional
-from datetime import datetime
-import uuid
-import hashlib
+from typing import Any, Dict, List, Optional, Tuple
+from functools import lru_cache
+from threading import Lock
 
 from firebase_admin import firestore, auth
+from cachetools import TTLCache
 from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from google.api_core.exceptions import NotFound
+from pydantic import TypeAdapter
 
-from app.models.user import User, UserCreate, UserUpdate, UserRole
+from app.models.user import User, UserCreate, UserUpdate, UserStatsAggregate
 from app.services.firebase_service import get_firestore_db
+from app.repositories.pagination import paginate, next_cursor
+
+USER_LIST_ADAPTER = TypeAdapter(List[User])
+USER_STATS_LIST_ADAPTER = TypeAdapter(List[UserStatsAggregate])
+
+# Recently read users, keyed by document ID; dropped when the user is written
+_cache = TTLCache(maxsize=4096, ttl=30)
+# Email -> user ID for users already found by email
+_email_cache = TTLCache(maxsize=4096, ttl=30)
+_cache_lock = Lock()
+
+def _invalidate(user_id: str) -> None:
+    """Drop a user from the read cache after it was written."""
+    with _cache_lock:
+        _cache.pop(user_id, None)
+
+@firestore.transactional
+def _apply_user_update(transaction, doc_ref, update_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Atomically check a user exists and apply an update to it.
+    
+    Returns:
+        The user data as stored after the update, including its ID
+        
+    Raises:
+        HTTPException: If user not found
+    """
+    snapshot = doc_ref.get(transaction=transaction)
+    
+    if not snapshot.exists:
+        raise HTTPException(status_code=404, detail="User not found")
+        
+    transaction.update(doc_ref, update_data)
+    
+    return {**snapshot.to_dict(), **update_data, "id": snapshot.id}
+
+def _aggregate_from_user(user_id: str, user_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build the user_stats_agg document for a user from the counters on their user document.
+    
+    Args:
+        user_id: The ID of the user
+        user_data: The stored user document
+        
+    Returns:
+        Dict in the user_stats_agg layout
+    """
+    stats = user_data.get("stats") or {}
+    return {
+        "user_id": user_id,
+        "total_questions_attempted": stats.get("total_questions_attempted", 0),
+        "correct_answers": stats.get("correct_answers", 0),
+        "category_stats": {
+            category: {
+                "attempted": counters.get("attempted", 0),
+                "correct": counters.get("correct", 0),
+            }
+            for category, counters in (user_data.get("category_stats") or {}).items()
+        },
+    }
+
+@firestore.transactional
+def _copy_user_stats(transaction, user_ref, agg_ref) -> Dict[str, Any]:
+    """
+    Overwrite a user's aggregate document with the counters from their user document.
+    Running in a transaction keeps the copy from racing a concurrent stats update.
+    
+    Returns:
+        The aggregate data that was written
+        
+    Raises:
+        HTTPException: If user not found
+    """
+    snapshot = user_ref.get(transaction=transaction)
+    
+    if not snapshot.exists:
+        raise HTTPException(status_code=404, detail="User not found")
+        
+    agg_data = _aggregate_from_user(snapshot.id, snapshot.to_dict())
+    transaction.set(agg_ref, agg_data)
+    
+    return agg_data
 
 class UserRepository:
     """Repository for user-related operations."""
@@ -18,26 +103,31 @@ class UserRepository:
     def __init__(self):
         self.db = get_firestore_db()
         self.collection = self.db.collection('users')
+        # One small counters document per user, so leaderboards don't scan full user documents
+        self.stats_collection = self.db.collection('user_stats_agg')
 
-    async def get_all(self, limit: int = 100) -> List[User]:
+    async def get_all(self, limit: int = 100, cursor: Optional[str] = None) -> Tuple[List[User], Optional[str]]:
         """
-        Get all users.
+        Get a page of users, oldest first.
         
         Args:
             limit: Maximum number of users to return
+            cursor: Cursor returned with the previous page
             
         Returns:
-            List of User objects
+            Tuple of (list of User objects, cursor for the next page or None)
+            
+        Raises:
+            HTTPException: If the cursor is malformed
         """
-        docs = self.collection.limit(limit).get()
+        query = paginate(self.collection, self.collection, cursor)
         
-        users = []
-        for doc in docs:
-            doc_data = doc.to_dict()
-            doc_data["id"] = doc.id
-            users.append(User.model_validate(doc_data))
-            
-        return users
+        # Convert to User objects as the documents stream in
+        raw = await run_in_threadpool(
+            lambda: [{**doc.to_dict(), "id": doc.id} for doc in query.limit(limit).stream()]
+        )
+        users = USER_LIST_ADAPTER.validate_python(raw)
+        return users, next_cursor(users, limit)
 
     async def get_by_id(self, user_id: str) -> User:
         """
@@ -52,7 +142,12 @@ class UserRepository:
         Raises:
             HTTPException: If user not found
         """
-        doc = self.collection.document(user_id).get()
+        with _cache_lock:
+            cached = _cache.get(user_id)
+        if cached is not None:
+            return cached
+            
+        doc = await run_in_threadpool(self.collection.document(user_id).get)
         
         if not doc.exists:
             raise HTTPException(status_code=404, detail="User not found")
@@ -60,7 +155,10 @@ class UserRepository:
         doc_data = doc.to_dict()
         doc_data["id"] = doc.id
         
-        return User.model_validate(doc_data)
+        user = User.model_validate(doc_data)
+        with _cache_lock:
+            _cache[user_id] = user
+        return user
 
     async def get_by_email(self, email: str) -> Optional[User]:
         """
@@ -72,13 +170,26 @@ class UserRepository:
         Returns:
             User object or None if not found
         """
+        with _cache_lock:
+            user_id = _email_cache.get(email)
+        if user_id is not None:
+            try:
+                return await self.get_by_id(user_id)
+            except HTTPException:
+                # Cached user is gone, fall back to the query
+                pass
+                
         query = self.collection.where("email", "==", email).limit(1)
-        docs = query.get()
+        docs = await run_in_threadpool(query.get)
         
         for doc in docs:
             doc_data = doc.to_dict()
             doc_data["id"] = doc.id
-            return User.model_validate(doc_data)
+            user = User.model_validate(doc_data)
+            with _cache_lock:
+                _email_cache[email] = doc.id
+                _cache[doc.id] = user
+            return user
             
         return None
 
@@ -102,7 +213,8 @@ class UserRepository:
         
         # Create user in Firebase Auth
         try:
-            firebase_user = auth.create_user(
+            firebase_user = await run_in_threadpool(
+                auth.create_user,
                 email=user.email,
                 password=user.password,
                 display_name=user.display_name
@@ -114,22 +226,16 @@ class UserRepository:
             raise HTTPException(status_code=500, detail=f"Error creating user in authentication: {str(e)}")
         
         # Convert Pydantic model to dict (excluding password)
-        user_dict = user.model_dump(exclude={"password"})
-        
-        # Convert enum values to strings
-        if isinstance(user_dict.get("role"), UserRole):
-            user_dict["role"] = user_dict["role"].value
+        user_dict = user.model_dump(mode="json", exclude={"password"})
         
-        # Add timestamps
-        now = datetime.now()
-        user_dict["created_at"] = now
-        user_dict["last_login"] = now
+        # Add timestamps, filled in by Firestore when the document is written
+        user_dict["created_at"] = firestore.SERVER_TIMESTAMP
+        user_dict["last_login"] = firestore.SERVER_TIMESTAMP
         
         # Add default stats, settings, etc.
         user_dict["stats"] = {
             "total_questions_attempted": 0,
             "correct_answers": 0,
-            "accuracy": 0.0,
             "streak": 0,
             "longest_streak": 0,
             "xp": 0,
@@ -146,10 +252,12 @@ class UserRepository:
         
         # Add to Firestore with Firebase Auth UID as document ID
         doc_ref = self.collection.document(user_id)
-        doc_ref.set(user_dict)
+        write_result = await run_in_threadpool(doc_ref.set, user_dict)
         
-        # Return created user
-        return await self.get_by_id(user_id)
+        # Return created user without re-reading it
+        user_dict["created_at"] = user_dict["last_login"] = write_result.update_time
+        user_dict["id"] = user_id
+        return User.model_validate(user_dict)
 
     async def update(self, user_id: str, user_data: UserUpdate) -> User:
         """
@@ -165,23 +273,20 @@ class UserRepository:
         Raises:
             HTTPException: If user not found
         """
-        # Check if user exists
-        doc_ref = self.collection.document(user_id)
-        doc = doc_ref.get()
-        
-        if not doc.exists:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # Prepare update data
-        update_data = user_data.model_dump(exclude_unset=True)
+        update_data = user_data.model_dump(mode="json", exclude_unset=True)
         
-        # Update in Firestore
-        doc_ref.update(update_data)
+        # Check existence and update in one transaction
+        doc_ref = self.collection.document(user_id)
+        user_dict = await run_in_threadpool(
+            lambda: _apply_user_update(self.db.transaction(), doc_ref, update_data)
+        )
+        _invalidate(user_id)
         
-        # Return updated user
-        return await self.get_by_id(user_id)
+        # Return updated user from the data the transaction already read
+        return User.model_validate(user_dict)
 
-    async def update_stats(self, user_id: str, question_id: str, category: str, is_correct: bool) -> User:
+    async def update_stats(self, user_id: str, question_id: str, category: str, is_correct: bool) -> bool:
         """
         Update user statistics after answering a question.
         
@@ -192,49 +297,141 @@ class UserRepository:
             is_correct: Whether the answer was correct
             
         Returns:
-            Updated User object
+            True if successful
             
         Raises:
             HTTPException: If user not found
         """
-        # Get current user
-        user = await self.get_by_id(user_id)
+        return await self.update_stats_batch(user_id, [(category, is_correct)])
+
+    async def update_stats_batch(self, user_id: str, results: List[Tuple[str, bool]]) -> bool:
+        """
+        Update user statistics after answering several questions.
         
-        # Update stats
-        doc_ref = self.collection.document(user_id)
+        Counters are bumped with server-side Increment sentinels, so no read is
+        needed and concurrent answers can't overwrite each other. The user document
+        and its user_stats_agg entry are written in one atomic batch.
+        Accuracy is derived from the counters when the user is read.
+        
+        Args:
+            user_id: The ID of the user
+            results: List of (category, is_correct) pairs, one per answered question
+            
+        Returns:
+            True if successful
+            
+        Raises:
+            HTTPException: If user not found
+        """
+        # Total the results per category
+        attempted = {}
+        correct = {}
+        for category, is_correct in results:
+            attempted[category] = attempted.get(category, 0) + 1
+            correct[category] = correct.get(category, 0) + int(is_correct)
         
-        # Get current stats
-        stats = user.stats.model_dump()
+        # Overall and per-category counters, addressed by dot-path
+        update_data = {
+            "stats.total_questions_attempted": firestore.Increment(len(results)),
+            "stats.correct_answers": firestore.Increment(sum(correct.values())),
+        }
+        for category in attempted:
+            update_data[f"category_stats.{category}.attempted"] = firestore.Increment(attempted[category])
+            update_data[f"category_stats.{category}.correct"] = firestore.Increment(correct[category])
         
-        # Update overall stats
-        stats["total_questions_attempted"] += 1
-        if is_correct:
-            stats["correct_answers"] += 1
+        # Same counters for the aggregate document, which is created on first use
+        agg_data = {
+            "user_id": user_id,
+            "total_questions_attempted": firestore.Increment(len(results)),
+            "correct_answers": firestore.Increment(sum(correct.values())),
+            "category_stats": {
+                category: {
+                    "attempted": firestore.Increment(attempted[category]),
+                    "correct": firestore.Increment(correct[category]),
+                }
+                for category in attempted
+            },
+        }
         
-        # Calculate new accuracy
-        if stats["total_questions_attempted"] > 0:
-            stats["accuracy"] = round(stats["correct_answers"] / stats["total_questions_attempted"] * 100, 2)
+        # Commit both writes together; the batch fails if the user doesn't exist
+        batch = self.db.batch()
+        batch.update(self.collection.document(user_id), update_data)
+        batch.set(self.stats_collection.document(user_id), agg_data, merge=True)
+        try:
+            await run_in_threadpool(batch.commit)
+        except NotFound:
+            raise HTTPException(status_code=404, detail="User not found")
+        _invalidate(user_id)
         
-        # Update category stats
-        category_stats = user.category_stats.copy() if user.category_stats else {}
+        return True
+
+    async def get_stats(self, user_id: str) -> UserStatsAggregate:
+        """
+        Get the aggregated answer counters for a user.
         
-        if category not in category_stats:
-            category_stats[category] = {"attempted": 0, "correct": 0, "accuracy": 0.0}
+        Args:
+            user_id: The ID of the user
             
-        category_stats[category]["attempted"] += 1
-        if is_correct:
-            category_stats[category]["correct"] += 1
+        Returns:
+            UserStatsAggregate object
             
-        if category_stats[category]["attempted"] > 0:
-            category_stats[category]["accuracy"] = round(
-                category_stats[category]["correct"] / category_stats[category]["attempted"] * 100, 2
-            )
+        Raises:
+            HTTPException: If user not found
+        """
+        doc = await run_in_threadpool(self.stats_collection.document(user_id).get)
+        
+        if doc.exists:
+            return UserStatsAggregate.model_validate(doc.to_dict())
+            
+        # Not aggregated yet (no answers since the collection was added, and not
+        # backfilled), so derive the counters from the user document itself
+        user_doc = await run_in_threadpool(self.collection.document(user_id).get)
+        
+        if not user_doc.exists:
+            raise HTTPException(status_code=404, detail="User not found")
+            
+        return UserStatsAggregate.model_validate(_aggregate_from_user(user_id, user_doc.to_dict()))
+
+    async def backfill_stats(self, user_id: str) -> UserStatsAggregate:
+        """
+        Rebuild a user's user_stats_agg document from their user document.
         
-        # Update in Firestore
-        doc_ref.update({
-            "stats": stats,
-            "category_stats": category_stats
-        })
+        Args:
+            user_id: The ID of the user
+            
+        Returns:
+            The rebuilt UserStatsAggregate object
+            
+        Raises:
+            HTTPException: If user not found
+        """
+        user_ref = self.collection.document(user_id)
+        agg_ref = self.stats_collection.document(user_id)
+        agg_data = await run_in_threadpool(
+            lambda: _copy_user_stats(self.db.transaction(), user_ref, agg_ref)
+        )
         
-        # Return updated user
-        return await self.get_by_id(user_id) 
\ No newline at end of file
+        return UserStatsAggregate.model_validate(agg_data)
+
+    async def get_leaderboard(self, limit: int = 10) -> List[UserStatsAggregate]:
+        """
+        Get the users with the most correct answers.
+        
+        Args:
+            limit: Number of users to return
+            
+        Returns:
+            List of UserStatsAggregate objects, best first
+        """
+        query = self.stats_collection.order_by("correct_answers", direction=firestore.Query.DESCENDING)
+        raw = await run_in_threadpool(lambda: [doc.to_dict() for doc in query.limit(limit).stream()])
+        
+        return USER_STATS_LIST_ADAPTER.validate_python(raw)
+
+
+@lru_cache()
+def get_user_repository() -> UserRepository:
+    """
+    Get the shared UserRepository instance, created once per worker.
+    """
+    return UserRepository()
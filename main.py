@@ -1,15 +1,43 @@
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.router import api_router
 from app.core.config import settings
+from app.repositories.pagination import NEXT_CURSOR_HEADER
+from app.repositories.attempts import get_attempt_repository
+from app.repositories.questions import get_question_repository
+from app.repositories.quizzes import get_quiz_repository
+from app.repositories.users import get_user_repository
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Build the Firestore client and the shared repositories once at startup,
+    so the first requests don't pay for it. The providers cache the instances,
+    and endpoints get them through Depends as before.
+    """
+    try:
+        get_question_repository()
+        get_quiz_repository()
+        get_user_repository()
+        get_attempt_repository()
+    except Exception as e:
+        # Don't fail app startup - e.g. missing credentials or project ID;
+        # repositories are built on first use instead
+        print(f"Repository warm-up skipped: {e}")
+    yield
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     description="Medical MCQ Gamified Test Prep API",
     version="1.0.0",
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # Set up CORS
@@ -19,6 +47,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # Include API router
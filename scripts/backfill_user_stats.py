@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Backfill the user_stats_agg collection from the counters stored on each user.
+
+Users who answered questions before user_stats_agg existed have no aggregate
+document (or one holding only the answers since), so the leaderboard and
+/users/{id}/stats disagree with /users/{id} until this has been run once.
+It is safe to run again: each aggregate is rebuilt from the user document.
+
+Run it from the project root as a module:
+    python -m scripts.backfill_user_stats
+"""
+import asyncio
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.repositories.users import get_user_repository
+
+# Users copied at the same time; each copy is one small transaction
+MAX_CONCURRENT_USERS = 20
+
+async def backfill_user_stats():
+    """
+    Rebuild the aggregate document of every user.
+    """
+    user_repo = get_user_repository()
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_USERS)
+
+    async def backfill(user_id: str):
+        async with semaphore:
+            return await user_repo.backfill_stats(user_id)
+
+    # Only the document IDs are needed, so list references instead of reading the users
+    user_ids = await run_in_threadpool(lambda: [ref.id for ref in user_repo.collection.list_documents()])
+    results = await asyncio.gather(*(backfill(user_id) for user_id in user_ids), return_exceptions=True)
+
+    errors = [(user_id, result) for user_id, result in zip(user_ids, results) if isinstance(result, Exception)]
+    print(f"Backfilled {len(user_ids) - len(errors)}/{len(user_ids)} users; {len(errors)} errors")
+    for user_id, error in errors[:3]:
+        print(f"Error backfilling user {user_id}: {error}")
+
+def main():
+    """
+    Run the backfill.
+    """
+    print("Backfilling user stats...")
+    asyncio.run(backfill_user_stats())
+    print("Done backfilling user stats!")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
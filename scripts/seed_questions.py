@@ -1,104 +1,150 @@
 #!/usr/bin/env python3
 """
 Seed script to populate the Firestore database with initial questions.
+
+Run it from the project root as a module:
+    python -m scripts.seed_questions [--verbose]
 """
+import argparse
 import os
-import sys
 import asyncio
 import uuid
 from pathlib import Path
+from typing import Any, Dict, List, Tuple
 
-# Add the project root to the Python path
-project_root = str(Path(__file__).parent.parent.absolute())
-sys.path.insert(0, project_root)
+import orjson
+from fastapi.concurrency import run_in_threadpool
 
 from app.models.question import QuestionCreate, Option, Category, Difficulty, OptionType
-from app.repositories.questions import QuestionRepository
+from app.repositories.questions import MAX_BATCH_WRITES, get_question_repository
+
+# Seed data, kept out of the module so it can be edited without touching code
+SAMPLE_QUESTIONS_PATH = Path(__file__).parent / "sample_questions.json"
+
+# Batch commit RPCs allowed in flight at once. Each batch holds up to MAX_BATCH_WRITES
+# questions, so a burst can carry up to 10 * 500 writes; this caps concurrency, not writes per second
+MAX_CONCURRENT_BATCHES = 10
+
+# Namespace for the seeded questions' document IDs, which are derived from their text
+_NS = uuid.UUID("00000000-0000-0000-0000-000000000001")
+
+# Every sample option is plain text unless the data says otherwise
+_TEXT = OptionType.TEXT
+
+def uuid_pool(n: int) -> List[str]:
+    """
+    Generate n random (version 4) UUID strings from a single os.urandom read.
+    
+    Args:
+        n: Number of UUIDs to generate
+        
+    Returns:
+        List of UUID strings
+    """
+    buf = os.urandom(16 * n)
+    return [str(uuid.UUID(bytes=buf[i * 16:(i + 1) * 16], version=4)) for i in range(n)]
 
-# Sample questions for seeding
-SAMPLE_QUESTIONS = [
-    {
-        "text": "Which of the following is NOT a branch of the external carotid artery?",
-        "explanation": "The ophthalmic artery is a branch of the internal carotid artery, not the external carotid artery. The other options (facial, maxillary, and superficial temporal) are all branches of the external carotid artery.",
-        "category": Category.ANATOMY,
-        "difficulty": Difficulty.MEDIUM,
-        "tags": ["head", "neck", "arteries", "carotid"],
-        "options": [
-            Option(id=str(uuid.uuid4()), content="Facial artery", is_correct=False, option_type=OptionType.TEXT),
-            Option(id=str(uuid.uuid4()), content="Maxillary artery", is_correct=False, option_type=OptionType.TEXT),
-            Option(id=str(uuid.uuid4()), content="Ophthalmic artery", is_correct=True, option_type=OptionType.TEXT),
-            Option(id=str(uuid.uuid4()), content="Superficial temporal artery", is_correct=False, option_type=OptionType.TEXT),
-        ]
-    },
-    {
-        "text": "Which hormone is primarily responsible for regulating blood calcium levels by increasing calcium absorption from the intestines?",
-        "explanation": "Calcitriol (1,25-dihydroxycholecalciferol), the active form of vitamin D, is primarily responsible for increasing calcium absorption from the intestines. Parathyroid hormone (PTH) increases blood calcium by stimulating bone resorption and increasing renal calcium reabsorption. Calcitonin decreases blood calcium by inhibiting bone resorption. Cortisol has minimal direct effects on calcium homeostasis.",
-        "category": Category.PHYSIOLOGY,
-        "difficulty": Difficulty.MEDIUM,
-        "tags": ["endocrinology", "calcium", "hormones", "vitamin D"],
-        "options": [
-            Option(id=str(uuid.uuid4()), content="Parathyroid hormone", is_correct=False, option_type=OptionType.TEXT),
-            Option(id=str(uuid.uuid4()), content="Calcitriol", is_correct=True, option_type=OptionType.TEXT),
-            Option(id=str(uuid.uuid4()), content="Calcitonin", is_correct=False, option_type=OptionType.TEXT),
-            Option(id=str(uuid.uuid4()), content="Cortisol", is_correct=False, option_type=OptionType.TEXT),
-        ]
-    },
-    {
-        "text": "A 67-year-old patient presents with fatigue, weight loss, and bone pain. Laboratory studies show hypercalcemia, anemia, and elevated total protein. Which of the following is the most likely diagnosis?",
-        "explanation": "Multiple myeloma is characterized by the proliferation of malignant plasma cells, which produces the classic triad of hypercalcemia, anemia, and elevated total protein (due to monoclonal gammopathy). Bone pain results from lytic lesions. Chronic lymphocytic leukemia typically presents with lymphocytosis and lymphadenopathy. Paget's disease presents with bone deformities and elevated alkaline phosphatase. Metastatic breast cancer can cause hypercalcemia but would not typically cause monoclonal gammopathy.",
-        "category": Category.PATHOLOGY,
-        "difficulty": Difficulty.HARD,
-        "tags": ["hematology", "oncology", "plasma cell disorders"],
-        "options": [
-            Option(id=str(uuid.uuid4()), content="Chronic lymphocytic leukemia", is_correct=False, option_type=OptionType.TEXT),
-            Option(id=str(uuid.uuid4()), content="Multiple myeloma", is_correct=True, option_type=OptionType.TEXT),
-            Option(id=str(uuid.uuid4()), content="Paget's disease of bone", is_correct=False, option_type=OptionType.TEXT),
-            Option(id=str(uuid.uuid4()), content="Metastatic breast cancer", is_correct=False, option_type=OptionType.TEXT),
-        ]
-    },
-    {
-        "text": "Which antibiotic mechanism involves inhibition of bacterial cell wall synthesis?",
-        "explanation": "Beta-lactam antibiotics (including penicillins, cephalosporins, carbapenems, and monobactams) inhibit bacterial cell wall synthesis by binding to penicillin-binding proteins (PBPs) and preventing peptidoglycan cross-linking. Aminoglycosides inhibit protein synthesis by binding to the 30S ribosomal subunit. Fluoroquinolones inhibit DNA gyrase and topoisomerase IV. Sulfonamides inhibit folic acid synthesis by inhibiting dihydropteroate synthase.",
-        "category": Category.PHARMACOLOGY,
-        "difficulty": Difficulty.EASY,
-        "tags": ["antibiotics", "microbiology", "cell wall"],
-        "options": [
-            Option(id=str(uuid.uuid4()), content="Aminoglycosides", is_correct=False, option_type=OptionType.TEXT),
-            Option(id=str(uuid.uuid4()), content="Fluoroquinolones", is_correct=False, option_type=OptionType.TEXT),
-            Option(id=str(uuid.uuid4()), content="Beta-lactams", is_correct=True, option_type=OptionType.TEXT),
-            Option(id=str(uuid.uuid4()), content="Sulfonamides", is_correct=False, option_type=OptionType.TEXT),
-        ]
-    },
-    {
-        "text": "Which of the following bacteria is NOT typically considered part of the normal human microbiota?",
-        "explanation": "Clostridium tetani, which causes tetanus, is not typically found as part of the normal human microbiota. It is primarily found in soil and animal feces. Escherichia coli is a normal inhabitant of the human gut. Staphylococcus epidermidis is found on human skin. Lactobacillus species are part of the normal vaginal flora.",
-        "category": Category.MICROBIOLOGY,
-        "difficulty": Difficulty.MEDIUM,
-        "tags": ["microbiota", "bacteria", "normal flora"],
-        "options": [
-            Option(id=str(uuid.uuid4()), content="Escherichia coli", is_correct=False, option_type=OptionType.TEXT),
-            Option(id=str(uuid.uuid4()), content="Staphylococcus epidermidis", is_correct=False, option_type=OptionType.TEXT),
-            Option(id=str(uuid.uuid4()), content="Clostridium tetani", is_correct=True, option_type=OptionType.TEXT),
-            Option(id=str(uuid.uuid4()), content="Lactobacillus species", is_correct=False, option_type=OptionType.TEXT),
-        ]
-    }
-]
+def _opt(option_id: str, content: str, is_correct: bool = False, option_type: str = _TEXT) -> Option:
+    """Build a sample option with the given ID."""
+    return Option.model_construct(
+        id=option_id,
+        content=content,
+        is_correct=is_correct,
+        option_type=OptionType(option_type)
+    )
 
-async def seed_questions():
+def build_sample_questions() -> List[Dict[str, Any]]:
+    """
+    Load the sample questions from sample_questions.json.
+    Called when seeding starts, so importing this module doesn't read the file or create the options.
+    
+    Returns:
+        List of question dicts with enum members and Option models, ready for QuestionCreate
+    """
+    data = orjson.loads(SAMPLE_QUESTIONS_PATH.read_bytes())
+    
+    # Draw every option ID from one pre-generated pool
+    ids = iter(uuid_pool(sum(len(question["options"]) for question in data)))
+    
+    return [
+        {
+            **question,
+            "category": Category(question["category"]),
+            "difficulty": Difficulty(question["difficulty"]),
+            "options": [_opt(next(ids), **option) for option in question["options"]],
+        }
+        for question in data
+    ]
+
+async def seed_questions(verbose: bool = False):
     """
     Seed the database with sample questions.
+    A single summary line is printed at the end; pass verbose to also list every created question.
+    Questions are written in batches of up to MAX_BATCH_WRITES, with at most
+    MAX_CONCURRENT_BATCHES batches in flight at once.
     """
-    question_repo = QuestionRepository()
+    question_repo = get_question_repository()
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_BATCHES)
+    
+    async def create(chunk: List[Tuple[str, QuestionCreate]]):
+        async with semaphore:
+            return await question_repo.create_many(
+                [question for _, question in chunk],
+                question_ids=[question_id for question_id, _ in chunk]
+            )
+    
+    # The sample data is already well-typed, so skip re-validating it
+    questions = [QuestionCreate.model_construct(**question_data) for question_data in build_sample_questions()]
+    
+    # Stable document IDs make re-runs idempotent: look them all up in one call
+    # and only write the questions that aren't there yet
+    ids = [str(uuid.uuid5(_NS, question.text)) for question in questions]
+    refs = [question_repo.collection.document(question_id) for question_id in ids]
+    snapshots = await run_in_threadpool(lambda: list(question_repo.db.get_all(refs, field_paths=[])))
+    existing = {snap.id for snap in snapshots if snap.exists}
+    pending = [(question_id, question) for question_id, question in zip(ids, questions) if question_id not in existing]
+    
+    if existing:
+        print(f"Skipping {len(existing)} questions that are already seeded")
+    
+    chunks = [pending[start:start + MAX_BATCH_WRITES] for start in range(0, len(pending), MAX_BATCH_WRITES)]
+    results = await asyncio.gather(*(create(chunk) for chunk in chunks), return_exceptions=True)
+    
+    # Tally the results instead of printing per question
+    created = 0
+    errors = []
+    for chunk, result in zip(chunks, results):
+        if isinstance(result, Exception):
+            errors.append((len(chunk), result))
+            continue
+        created += len(result)
+        if verbose:
+            for created_question in result:
+                print(f"Created question: {created_question.id} - {created_question.text[:30]}...")
     
-    for question_data in SAMPLE_QUESTIONS:
-        question = QuestionCreate(**question_data)
-        try:
-            created_question = await question_repo.create(question)
-            print(f"Created question: {created_question.id} - {created_question.text[:30]}...")
-        except Exception as e:
-            print(f"Error creating question: {e}")
+    failed = sum(count for count, _ in errors)
+    print(f"Created {created}/{len(pending)} questions; {failed} errors")
+    for count, error in errors[:3]:
+        print(f"Error creating {count} questions: {error}")
 
-if __name__ == "__main__":
+def main():
+    """
+    Parse the command line and run the seed.
+    """
+    # Use uvloop's faster event loop when it's installed
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+        
+    parser = argparse.ArgumentParser(description="Seed Firestore with the sample questions.")
+    parser.add_argument("--verbose", action="store_true", help="List every created question")
+    args = parser.parse_args()
+    
     print("Seeding questions...")
-    asyncio.run(seed_questions())
-    print("Done seeding questions!") 
\ No newline at end of file
+    asyncio.run(seed_questions(verbose=args.verbose))
+    print("Done seeding questions!")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file